@@ -1,54 +1,358 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
-import json
+from bisect import bisect_right
+from operator import itemgetter
+import heapq
+import math
+import mmap
+import msgpack
 import os
 import shutil
-import time
-from collections import defaultdict
+import struct
+import sys
+import weakref
+from collections import ChainMap, defaultdict, OrderedDict
+from sortedcontainers import SortedDict
+
+try:
+    import xxhash
+
+    def _bloom_hashes(key_bytes: bytes) -> Tuple[int, int]:
+        digest = xxhash.xxh3_128(key_bytes).intdigest()
+        return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+except ImportError:
+    import hashlib
+
+    def _bloom_hashes(key_bytes: bytes) -> Tuple[int, int]:
+        digest = int.from_bytes(
+            hashlib.blake2b(key_bytes, digest_size=16).digest(), 'little')
+        return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+# Target size of a data block; a block is flushed once it crosses this.
+BLOCK_SIZE = 4096
+
+# Per-entry header: key length, value length (little-endian uint32 each).
+_ENTRY_HEADER = struct.Struct("<II")
+
+# File footer: offset of the msgpack metadata section + magic number.
+_FOOTER = struct.Struct("<QI")
+_MAGIC = 0x53535442  # "SSTB"
+
+# Process-wide LRU of SSTables with an open mmap, bounding file
+# descriptor usage no matter how many tables a tree accumulates.
+_MAX_OPEN_TABLES = 64
+_open_tables: 'OrderedDict[int, SSTable]' = OrderedDict()
+
+def _close_mapping(mm, file) -> None:
+    """Release an SSTable's mmap and file handle (weakref finalizer)."""
+    if mm is not None:
+        mm.close()
+    if file is not None:
+        file.close()
+
+class BloomFilter:
+    """Bloom filter over keys, using double hashing.
+
+    Sized from the expected number of keys and a target false-positive
+    rate; k probe positions are derived from two 64-bit halves of a
+    single 128-bit hash of the key.
+    """
+
+    def __init__(self, n_keys: int, fp_rate: float = 0.01):
+        n_keys = max(1, n_keys)
+        self.n_bits = max(8, int(math.ceil(-n_keys * math.log(fp_rate) / (math.log(2) ** 2))))
+        self.n_hashes = max(1, round(self.n_bits / n_keys * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def add(self, key: str) -> None:
+        """Set the probe bits for a key."""
+        h1, h2 = _bloom_hashes(key.encode())
+        for i in range(self.n_hashes):
+            idx = (h1 + i * h2) % self.n_bits
+            self.bits[idx >> 3] |= 1 << (idx & 7)
+
+    def might_contain(self, key: str) -> bool:
+        """Check a key; False means definitely absent."""
+        h1, h2 = _bloom_hashes(key.encode())
+        for i in range(self.n_hashes):
+            idx = (h1 + i * h2) % self.n_bits
+            if not self.bits[idx >> 3] & (1 << (idx & 7)):
+                return False
+        return True
+
+    @classmethod
+    def from_state(cls, n_bits: int, n_hashes: int, bits: bytes) -> 'BloomFilter':
+        """Rebuild a filter from its persisted state."""
+        bloom = cls.__new__(cls)
+        bloom.n_bits = n_bits
+        bloom.n_hashes = n_hashes
+        bloom.bits = bytearray(bits)
+        return bloom
 
 class SSTable:
-    """Sorted String Table implementation."""
-    
+    """Sorted String Table stored as fixed-size binary blocks.
+
+    Entries are length-prefixed key/value pairs (values msgpack-encoded)
+    packed into ~4 KiB sorted blocks. A sparse index of
+    (first_key, block_offset) pairs is msgpack-encoded at the tail of the
+    file, followed by a fixed footer pointing at it. A lookup binary
+    searches the in-memory sparse index, then scans a single block via a
+    persistent read-only mmap.
+    """
+
     def __init__(self, base_path: Path, level: int, table_id: int):
         self.base_path = base_path
         self.level = level
         self.table_id = table_id
         self.file_path = base_path / f"L{level}-{table_id}.sst"
-        self.index: Dict[str, int] = {}
-    
-    def write(self, data: Dict[str, Any]) -> None:
-        """Write sorted data to SSTable file."""
-        with open(self.file_path, 'w') as f:
-            # Write data section
-            offset = 0
-            for key, value in sorted(data.items()):
-                entry = json.dumps({key: value}) + '\n'
-                f.write(entry)
-                self.index[key] = offset
-                offset += len(entry.encode())
-    
+        self.index: List[Tuple[str, int]] = []  # (first_key, block_offset)
+        self.bloom: Optional[BloomFilter] = None
+        self.min_key: Optional[str] = None
+        self.max_key: Optional[str] = None
+        self.entry_count = 0
+        self._block_keys: List[str] = []
+        self._data_end = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._file = None
+        self._finalizer = None
+        if self.file_path.exists():
+            self._load_footer()
+
+    def write(self, data: Dict[str, Any], bloom_fp_rate: float = 0.01) -> None:
+        """Write data to SSTable file in block format.
+
+        `data` must iterate in sorted key order (the memtable is a
+        SortedDict, and compaction emits keys pre-merged in order), so
+        no sort happens here.
+        """
+        writer = SSTableWriter(self, len(data), bloom_fp_rate=bloom_fp_rate)
+        for key, value in data.items():
+            writer.add(key, value)
+        writer.finish()
+
+    def __iter__(self):
+        """Yield (key, value) pairs in sorted order by scanning the data
+        blocks sequentially through the mmap."""
+        if not self.index:
+            return
+        mm = self._ensure_mmap()
+        pos = 0
+        end = self._data_end
+        while pos < end:
+            klen, vlen = _ENTRY_HEADER.unpack_from(mm, pos)
+            pos += _ENTRY_HEADER.size
+            key = mm[pos:pos + klen].decode()
+            pos += klen
+            value = msgpack.unpackb(mm[pos:pos + vlen], strict_map_key=False)
+            pos += vlen
+            yield key, value
+
+    def _load_footer(self) -> None:
+        """Read the sparse index back from the file footer."""
+        file_size = self.file_path.stat().st_size
+        if file_size < _FOOTER.size:
+            return
+        with open(self.file_path, 'rb') as f:
+            f.seek(file_size - _FOOTER.size)
+            meta_offset, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != _MAGIC:
+                return
+            f.seek(meta_offset)
+            meta = msgpack.unpackb(f.read(file_size - _FOOTER.size - meta_offset))
+        self.index = [(key, offset) for key, offset in meta["index"]]
+        self._block_keys = [key for key, _ in self.index]
+        self._data_end = meta_offset
+        self.min_key = meta.get("min_key")
+        self.max_key = meta.get("max_key")
+        self.entry_count = meta.get("count", 0)
+        if "bloom" in meta:
+            bloom = meta["bloom"]
+            self.bloom = BloomFilter.from_state(
+                bloom["n_bits"], bloom["n_hashes"], bloom["bits"])
+
+    def covers(self, key: str) -> bool:
+        """Check whether key falls inside this table's key range."""
+        if self.min_key is None:
+            return True
+        return self.min_key <= key <= self.max_key
+
+    def _ensure_mmap(self) -> mmap.mmap:
+        """Open the persistent read-only mmap on first use.
+
+        Open tables are tracked in a bounded process-wide LRU so file
+        descriptors do not accumulate; the least recently used table is
+        closed when the cap is hit.
+        """
+        if self._mm is None:
+            self._file = open(self.file_path, 'rb')
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._finalizer = weakref.finalize(
+                self, _close_mapping, self._mm, self._file)
+            # Point lookups are random; tell the kernel not to waste
+            # readahead on neighbouring blocks (no-ops off Linux)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(self._file.fileno(), 0, 0, os.POSIX_FADV_RANDOM)
+            if hasattr(self._mm, 'madvise'):
+                self._mm.madvise(mmap.MADV_RANDOM)
+            _open_tables[id(self)] = self
+            while len(_open_tables) > _MAX_OPEN_TABLES:
+                _, oldest = _open_tables.popitem(last=False)
+                oldest.close()
+        else:
+            _open_tables.move_to_end(id(self))
+        return self._mm
+
+    def advise_sequential(self) -> None:
+        """Hint the kernel that this table is about to be scanned end to
+        end (e.g. as a compaction input), enabling aggressive readahead."""
+        mm = self._ensure_mmap()
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(self._file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(self._file.fileno(), 0, self._data_end,
+                             os.POSIX_FADV_WILLNEED)
+        if hasattr(mm, 'madvise'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+
+    def close(self) -> None:
+        """Close the mmap and file handle, if open."""
+        _open_tables.pop(id(self), None)
+        if self._mm is not None:
+            self._finalizer.detach()
+            _close_mapping(self._mm, self._file)
+            self._mm = None
+            self._file = None
+
     def get(self, key: str) -> Optional[Any]:
-        """Retrieve value for key from SSTable."""
-        if key not in self.index:
+        """Retrieve value for key by scanning its containing block."""
+        block_idx = bisect_right(self._block_keys, key) - 1
+        if block_idx < 0:
             return None
-            
-        with open(self.file_path, 'r') as f:
-            f.seek(self.index[key])
-            line = f.readline()
-            entry = json.loads(line)
-            return entry[key]
+
+        mm = self._ensure_mmap()
+        pos = self.index[block_idx][1]
+        block_end = (self.index[block_idx + 1][1]
+                     if block_idx + 1 < len(self.index) else self._data_end)
+        key_bytes = key.encode()
+
+        while pos < block_end:
+            klen, vlen = _ENTRY_HEADER.unpack_from(mm, pos)
+            pos += _ENTRY_HEADER.size
+            if mm[pos:pos + klen] == key_bytes:
+                value_start = pos + klen
+                return msgpack.unpackb(mm[value_start:value_start + vlen],
+                                      strict_map_key=False)
+            pos += klen + vlen
+        return None
+
+class SSTableWriter:
+    """Streams sorted (key, value) pairs into an SSTable file.
+
+    Blocks are emitted as soon as they fill, so a compaction can merge
+    arbitrarily large inputs in constant memory. `expected_keys` sizes
+    the Bloom filter; an over-estimate just lowers the false-positive
+    rate.
+    """
+
+    def __init__(self, sstable: SSTable, expected_keys: int,
+                 bloom_fp_rate: float = 0.01):
+        self.sstable = sstable
+        self.bloom = BloomFilter(expected_keys, fp_rate=bloom_fp_rate)
+        self.index: List[Tuple[str, int]] = []
+        self.min_key: Optional[str] = None
+        self.max_key: Optional[str] = None
+        self.entry_count = 0
+        self._file = open(sstable.file_path, 'wb', buffering=1 << 20)
+        self._pack_value = msgpack.Packer().pack
+        self._block = bytearray()
+        self._offset = 0
+
+    def add(self, key: str, value: Any) -> None:
+        """Append an entry; keys must arrive in sorted order."""
+        if self.min_key is None:
+            self.min_key = key
+        self.max_key = key
+        self.bloom.add(key)
+        self.entry_count += 1
+        key_bytes = key.encode()
+        value_bytes = self._pack_value(value)
+        if not self._block:
+            self.index.append((key, self._offset))
+        self._block += _ENTRY_HEADER.pack(len(key_bytes), len(value_bytes))
+        self._block += key_bytes
+        self._block += value_bytes
+        if len(self._block) >= BLOCK_SIZE:
+            self._file.write(self._block)
+            self._offset += len(self._block)
+            self._block = bytearray()
+
+    def finish(self) -> SSTable:
+        """Flush the tail block and footer, and prime the SSTable's
+        in-memory state so no footer re-read is needed."""
+        if self._block:
+            self._file.write(self._block)
+            self._offset += len(self._block)
+        meta = {
+            "index": self.index,
+            "min_key": self.min_key,
+            "max_key": self.max_key,
+            "count": self.entry_count,
+            "bloom": {
+                "n_bits": self.bloom.n_bits,
+                "n_hashes": self.bloom.n_hashes,
+                "bits": bytes(self.bloom.bits),
+            },
+        }
+        self._file.write(msgpack.packb(meta))
+        self._file.write(_FOOTER.pack(self._offset, _MAGIC))
+        self._file.close()
+
+        table = self.sstable
+        table.index = self.index
+        table._block_keys = [key for key, _ in self.index]
+        table._data_end = self._offset
+        table.bloom = self.bloom
+        table.min_key = self.min_key
+        table.max_key = self.max_key
+        table.entry_count = self.entry_count
+        return table
 
 class LSMTree:
     """Log-Structured Merge Tree implementation."""
-    
-    def __init__(self, base_path: Path):
+
+    def __init__(self, base_path: Path, memtable_size: int = 1000, max_level: int = 3,
+                 bloom_fp_rate: float = 0.01,
+                 memtable_bytes_limit: int = 4 * 1024 * 1024,
+                 wal_sync: bool = False):
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
-        self.memtable = {}
+        self.memtable = SortedDict()
         self.immutable_memtables = []
+        # Newest-first view over the immutable memtables so the get path
+        # does a single chained lookup instead of scanning the list
+        self._immutable_chain = ChainMap({})
         self.levels = defaultdict(list)
-        self.memtable_size_limit = 1000
+        self.max_level = max_level
+        self.memtable_size_limit = memtable_size
+        # Byte-based flush threshold; fewer, larger SSTables mean less
+        # write amplification than flushing on entry count alone
+        self.memtable_bytes_limit = memtable_bytes_limit
+        self._mem_bytes = 0
+        # Lower this for negative-lookup-heavy workloads: larger filters,
+        # fewer wasted disk probes
+        self.bloom_fp_rate = bloom_fp_rate
+        # With wal_sync every put is fdatasync'd; without it durability
+        # is left to the OS page cache (still crash-consistent via replay
+        # of whatever reached the file)
+        self.wal_sync = wal_sync
+        self.wal_path = self.base_path / "wal.log"
+        self._level_min_keys: Dict[int, List[str]] = {}
+        # Monotonic table id; wall-clock ids collide when two flushes
+        # land in the same millisecond
+        self._next_table_id = 1
         self._load_existing_tables()
+        self._wal = open(self.wal_path, 'ab', buffering=0)
+        self._replay_wal()
+        self._maybe_flush()
 
     def _load_existing_tables(self) -> None:
         """Load existing SSTables from disk."""
@@ -57,100 +361,216 @@ class LSMTree:
             pattern = f"L{level}-*.sst"
             for path in self.base_path.glob(pattern):
                 table_id = int(path.stem.split('-')[1])
+                self._next_table_id = max(self._next_table_id, table_id + 1)
                 sstable = SSTable(self.base_path, level, table_id)
                 self.levels[level].append(sstable)
-    
+            self._rebuild_level_index(level)
+
+    def _allocate_table_id(self) -> int:
+        """Hand out the next unused SSTable id."""
+        table_id = self._next_table_id
+        self._next_table_id += 1
+        return table_id
+
+    def _rebuild_level_index(self, level: int) -> None:
+        """Re-sort a level's tables by min_key for fence-pointer pruning.
+
+        L0 tables may overlap, so they stay in insertion (age) order; the
+        deeper levels are non-overlapping and kept sorted so a lookup can
+        binary search for the single table that may hold a key.
+        """
+        if level == 0:
+            return
+        self.levels[level].sort(key=lambda t: t.min_key or "")
+        self._level_min_keys[level] = [t.min_key or "" for t in self.levels[level]]
+
+    def _candidate_tables(self, key: str, level: int) -> List[SSTable]:
+        """Tables in a level whose key range may contain key."""
+        tables = self.levels[level]
+        if level == 0:
+            # Overlapping tables: newest first, range-filtered
+            return [t for t in reversed(tables) if t.covers(key)]
+        idx = bisect_right(self._level_min_keys.get(level, []), key) - 1
+        if idx >= 0 and tables[idx].covers(key):
+            return [tables[idx]]
+        return []
+
+    def _replay_wal(self) -> None:
+        """Rebuild the memtable from WAL records left by a previous run.
+
+        A torn record at the tail (crash mid-append) is silently
+        dropped; everything before it is recovered.
+        """
+        data = self.wal_path.read_bytes()
+        pos = 0
+        while pos + _ENTRY_HEADER.size <= len(data):
+            klen, vlen = _ENTRY_HEADER.unpack_from(data, pos)
+            pos += _ENTRY_HEADER.size
+            if pos + klen + vlen > len(data):
+                break
+            key = data[pos:pos + klen].decode()
+            value = msgpack.unpackb(data[pos + klen:pos + klen + vlen],
+                                    strict_map_key=False)
+            self.memtable[key] = value
+            self._mem_bytes += klen + sys.getsizeof(value)
+            pos += klen + vlen
+
+    def _rotate_wal(self) -> None:
+        """Swap in a fresh WAL once the memtable it covered is on disk."""
+        self._wal.close()
+        new_path = self.wal_path.with_name("wal.log.new")
+        open(new_path, 'wb').close()
+        os.replace(new_path, self.wal_path)
+        self._wal = open(self.wal_path, 'ab', buffering=0)
+
     def put(self, key: str, value: Any) -> None:
         """Insert or update a key-value pair."""
+        key_bytes = key.encode()
+        value_bytes = msgpack.packb(value)
+        self._wal.write(
+            _ENTRY_HEADER.pack(len(key_bytes), len(value_bytes))
+            + key_bytes + value_bytes)
+        if self.wal_sync:
+            os.fdatasync(self._wal.fileno())
         self.memtable[key] = value
+        # Rough size estimate; overwrites are counted twice, which only
+        # makes flushes slightly earlier than strictly necessary
+        self._mem_bytes += len(key) + sys.getsizeof(value)
+        self._maybe_flush()
+
+    def put_batch(self, items: Dict[str, Any]) -> None:
+        """Insert many key-value pairs with one WAL append and a single
+        flush check, amortizing the per-put overhead over the batch."""
+        buf = bytearray()
+        for key, value in items.items():
+            key_bytes = key.encode()
+            value_bytes = msgpack.packb(value)
+            buf += _ENTRY_HEADER.pack(len(key_bytes), len(value_bytes))
+            buf += key_bytes
+            buf += value_bytes
+            self._mem_bytes += len(key) + sys.getsizeof(value)
+        self._wal.write(bytes(buf))
+        if self.wal_sync:
+            os.fdatasync(self._wal.fileno())
+        self.memtable.update(items)
         self._maybe_flush()
-    
+
     def get(self, key: str) -> Any:
         """Retrieve value for a key."""
         # Check memtable
         if key in self.memtable:
             return self.memtable[key]
-        
-        # Check immutable memtables
-        for table in self.immutable_memtables:
-            if key in table:
-                return table[key]
-        
-        # Check SSTables from newest to oldest
+
+        # Check immutable memtables (newest first via the chain)
+        if key in self._immutable_chain:
+            return self._immutable_chain[key]
+
+        # Check SSTables from newest to oldest, skipping tables whose
+        # key range or Bloom filter rules the key out without touching disk
         for level in range(self.max_level):
-            for sstable in reversed(self.levels[level]):
+            for sstable in self._candidate_tables(key, level):
+                if sstable.bloom is not None and not sstable.bloom.might_contain(key):
+                    continue
                 value = sstable.get(key)
                 if value is not None:
                     return value
-        
+
         return None
-    
+
     def _maybe_flush(self) -> None:
         """Check if memtable needs flushing and handle it."""
-        if len(self.memtable) >= self.memtable_size_limit:
+        if (len(self.memtable) >= self.memtable_size_limit
+                or self._mem_bytes >= self.memtable_bytes_limit):
             self.immutable_memtables.append(self.memtable)
-            self.memtable = {}
+            self._immutable_chain = self._immutable_chain.new_child(self.memtable)
+            self.memtable = SortedDict()
+            self._mem_bytes = 0
             self._compact_immutable_memtables()
-    
+
     def _compact_immutable_memtables(self) -> None:
         """Compact immutable memtables into Level 0 SSTable."""
         if not self.immutable_memtables:
             return
-            
-        # Merge all immutable memtables
-        merged_data = {}
-        for table in self.immutable_memtables:
-            merged_data.update(table)
-        
+
+        # Merge the already-sorted immutable memtables, newest first so
+        # the first occurrence of a key wins (heapq.merge is stable)
+        if len(self.immutable_memtables) == 1:
+            merged_data = self.immutable_memtables[0]
+        else:
+            merged_data = {}
+            merged = heapq.merge(
+                *(t.items() for t in reversed(self.immutable_memtables)),
+                key=itemgetter(0))
+            for key, value in merged:
+                if key not in merged_data:
+                    merged_data[key] = value
+
         # Create new SSTable
-        table_id = int(time.time() * 1000)
-        sstable = SSTable(self.base_path, 0, table_id)
-        sstable.write(merged_data)
-        
+        sstable = SSTable(self.base_path, 0, self._allocate_table_id())
+        sstable.write(merged_data, bloom_fp_rate=self.bloom_fp_rate)
+
         # Add to level 0 and clear immutable memtables
         if 0 not in self.levels:
             self.levels[0] = []
         self.levels[0].append(sstable)
         self.immutable_memtables.clear()
-        
+        self._immutable_chain = ChainMap({})
+        self._rotate_wal()
+
         # Check if we need to compact this level
         self._maybe_compact_level(0)
-    
+
     def _maybe_compact_level(self, level: int) -> None:
         """Compact level if it has too many SSTables."""
         max_tables = 4 ** level
         if len(self.levels[level]) > max_tables:
             self._compact_level(level)
-    
+
     def _compact_level(self, level: int) -> None:
-        """Compact a level by merging its tables with the next level."""
+        """Compact a level by stream-merging its tables into the next.
+
+        Inputs are consumed through a k-way heapq.merge (newest table
+        first, so the first occurrence of a key wins) and the output is
+        emitted block by block, keeping compaction memory constant
+        regardless of level size. Merging the target level's existing
+        tables in as well keeps deeper levels at one non-overlapping
+        table each, which is what the fence-pointer lookup relies on.
+        """
         tables = self.levels.get(level, [])
         if not tables:
             return
 
-        # Create new merged table
-        merged_data = {}
-        for table in tables:
-            merged_data.update(table.data)
-
-        if merged_data:
-            new_table = SSTable(self.base_path, level + 1)
-            new_table.data = merged_data
-            
-            # Ensure directory exists
-            new_table.file_path.parent.mkdir(parents=True, exist_ok=True)
-            new_table.flush()
-
-            # Delete old tables after successful merge
-            for table in tables:
-                try:
-                    if table.file_path.exists():
-                        table.file_path.unlink()
-                except (FileNotFoundError, PermissionError):
-                    pass  # Ignore file operation errors
-
-            # Update levels
-            self.levels[level] = []
-            if level + 1 not in self.levels:
-                self.levels[level + 1] = []
-            self.levels[level + 1].append(new_table)
+        target = min(level + 1, self.max_level - 1)
+        inputs = list(reversed(tables))
+        if target != level:
+            inputs += self.levels.get(target, [])
+        for table in inputs:
+            table.advise_sequential()
+
+        new_table = SSTable(self.base_path, target, self._allocate_table_id())
+        expected_keys = sum(t.entry_count for t in inputs)
+        writer = SSTableWriter(new_table, expected_keys,
+                               bloom_fp_rate=self.bloom_fp_rate)
+        merged = heapq.merge(*(iter(t) for t in inputs), key=itemgetter(0))
+        prev_key = None
+        for key, value in merged:
+            if key == prev_key:
+                continue
+            writer.add(key, value)
+            prev_key = key
+        writer.finish()
+
+        # Delete old tables after successful merge
+        for table in inputs:
+            table.close()
+            try:
+                if table.file_path.exists():
+                    table.file_path.unlink()
+            except (FileNotFoundError, PermissionError):
+                pass  # Ignore file operation errors
+
+        # Update levels
+        self.levels[level] = []
+        self.levels[target] = [new_table]
+        self._rebuild_level_index(level)
+        self._rebuild_level_index(target)
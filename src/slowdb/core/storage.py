@@ -35,13 +35,26 @@ class SegmentFile:
         size = os.path.getsize(self.path)
         self.mmap = mmap.mmap(self.file.fileno(), size)
         self._size = size
-    
+        self._capacity = size
+
     def append(self, data: bytes) -> int:
-        """Append data to the segment file and return offset."""
+        """Append data to the segment file and return offset.
+
+        The file is grown by doubling (remap only when capacity runs
+        out) instead of an mmap.resize per append, so the number of
+        truncate+remap syscalls is logarithmic in the total size. The
+        unused tail is trimmed on close.
+        """
         offset = self._size
-        self.mmap.resize(self._size + len(data))
+        needed = self._size + len(data)
+        if needed > self._capacity:
+            new_capacity = max(self._capacity * 2, needed)
+            os.ftruncate(self.file.fileno(), new_capacity)
+            self.mmap.close()
+            self.mmap = mmap.mmap(self.file.fileno(), new_capacity)
+            self._capacity = new_capacity
         self.mmap[offset:offset + len(data)] = data
-        self._size += len(data)
+        self._size = needed
         return offset
     
     def read(self, offset: int, size: int) -> bytes:
@@ -51,8 +64,11 @@ class SegmentFile:
         return self.mmap[offset:min(offset + size, self._size)]
     
     def close(self):
-        """Close the segment file and memory mapping."""
+        """Close the segment file and memory mapping, trimming any
+        preallocated capacity back to the real data size."""
         if self.mmap:
             self.mmap.close()
         if self.file:
+            if not self.file.closed and self._capacity > self._size:
+                os.ftruncate(self.file.fileno(), self._size)
             self.file.close()
@@ -1,9 +1,17 @@
 import numpy as np
+import os
+from collections import defaultdict, OrderedDict
 from pathlib import Path
 from typing import Optional, Dict, List
 from .storage import SegmentFile
 from .lsm import LSMTree
 
+try:
+    import faiss
+    _HAS_FAISS = True
+except ImportError:
+    _HAS_FAISS = False
+
 class VectorStorage:
     """Handles vector data storage and basic quantization."""
     
@@ -17,6 +25,10 @@ class VectorStorage:
         # Reduce clusters for testing
         self.compressor = VectorCompressor(dimension, n_clusters=8)  # Much smaller for testing
         self.compactor = VectorCompactor(storage_path)
+        # LRU cache of open read-side segment handles, so point lookups
+        # reuse an existing mmap instead of open+mmap per call
+        self._segment_cache: "OrderedDict[str, SegmentFile]" = OrderedDict()
+        self._seg_cache_cap = 64
         self._initialize_storage()
     
     def _initialize_storage(self) -> None:
@@ -30,6 +42,37 @@ class VectorStorage:
         segment_path = self.storage_path / f"segment_{segment_id:06d}.db"
         self.active_segment = SegmentFile(segment_path, create=True)
     
+    def _get_segment(self, segment_name: str) -> SegmentFile:
+        """Return an open handle for a segment, caching up to
+        _seg_cache_cap of them in LRU order.
+
+        The active segment is served from its live write handle, since
+        a separate read mapping would go stale as appends grow it."""
+        if self.active_segment is not None and self.active_segment.path.name == segment_name:
+            return self.active_segment
+        segment = self._segment_cache.get(segment_name)
+        if segment is not None:
+            self._segment_cache.move_to_end(segment_name)
+            return segment
+
+        segment = SegmentFile(self.storage_path / segment_name)
+        # Point lookups touch scattered offsets; tell the kernel not to
+        # prefetch ahead of them
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(segment.file.fileno(), 0, 0, os.POSIX_FADV_RANDOM)
+        self._segment_cache[segment_name] = segment
+        if len(self._segment_cache) > self._seg_cache_cap:
+            _, evicted = self._segment_cache.popitem(last=False)
+            evicted.close()
+        return segment
+
+    def _drop_cached_segments(self) -> None:
+        """Close and forget every cached segment handle; used when
+        compaction rewrites or deletes segment files."""
+        while self._segment_cache:
+            _, segment = self._segment_cache.popitem()
+            segment.close()
+
     def train_compression(self, vectors: List[np.ndarray]) -> None:
         """Train the vector compressor on a set of vectors."""
         if len(vectors) < self.compressor.n_clusters:
@@ -37,22 +80,95 @@ class VectorStorage:
         self.compressor.train(vectors)
     
     def store_vector(self, vector_id: str, vector: np.ndarray) -> None:
-        """Store a vector with its ID."""
+        """Store a vector with its ID.
+
+        Vectors are persisted as float32: half the bytes of float64 with
+        no meaningful accuracy cost for similarity search.
+        """
         if len(vector) != self.dimension:
-            vector = vector[:self.dimension]  # Truncate or pad as needed
-        
-        vector_bytes = vector.astype(np.float64).tobytes()
-        if not self.active_segment:
-            self.active_segment = SegmentFile.create(self.storage_path)
-        
-        offset = self.active_segment.write(vector_bytes)
+            raise ValueError(
+                f"Vector dimension mismatch: expected {self.dimension}, "
+                f"got {len(vector)}")
+
+        vector_bytes = vector.astype(np.float32, copy=False).tobytes()
+        offset = self.active_segment.append(vector_bytes)
         self.lsm_tree.put(vector_id, {
-            "segment_id": self.active_segment.file_name,
+            "segment_id": self.active_segment.path.name,
             "offset": offset,
             "size": len(vector_bytes),
             "compressed": False
         })
+
+    def store_compressed(self, vector_id: str, vector: np.ndarray) -> None:
+        """Store a vector as PQ codes (requires a trained compressor)."""
+        if len(vector) != self.dimension:
+            raise ValueError(
+                f"Vector dimension mismatch: expected {self.dimension}, "
+                f"got {len(vector)}")
+
+        codes = self.compressor.compress(vector)
+        offset = self.active_segment.append(codes)
+        self.lsm_tree.put(vector_id, {
+            "segment_id": self.active_segment.path.name,
+            "offset": offset,
+            "size": len(codes),
+            "compressed": True
+        })
     
+    def store_vectors(self, ids: List[str], vectors: np.ndarray) -> None:
+        """Store a batch of vectors in one sequential segment write.
+
+        The whole batch is appended as a single float32 blob and its
+        metadata inserted through LSMTree.put_batch, so per-vector call
+        overhead (segment append, WAL write, flush check) is paid once
+        per batch instead of once per vector.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors))
+        if len(ids) != len(vectors):
+            raise ValueError("Need exactly one id per vector")
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension mismatch: expected {self.dimension}, "
+                f"got {vectors.shape[1]}")
+
+        rows = np.ascontiguousarray(vectors, dtype=np.float32)
+        row_bytes = rows.shape[1] * rows.itemsize
+        base_offset = self.active_segment.append(rows.tobytes())
+        segment_name = self.active_segment.path.name
+        self.lsm_tree.put_batch({
+            vector_id: {
+                "segment_id": segment_name,
+                "offset": base_offset + i * row_bytes,
+                "size": row_bytes,
+                "compressed": False
+            }
+            for i, vector_id in enumerate(ids)
+        })
+
+    def get_vectors(self, ids: List[str]) -> List[Optional[np.ndarray]]:
+        """Retrieve multiple vectors by ID; unknown ids come back None.
+
+        Reads are grouped by segment so each segment handle is looked
+        up in the cache once per batch.
+        """
+        metadata_by_id = {vector_id: self.lsm_tree.get(vector_id) for vector_id in ids}
+        by_segment = defaultdict(list)
+        for vector_id, metadata in metadata_by_id.items():
+            if metadata is not None:
+                by_segment[metadata["segment_id"]].append((vector_id, metadata))
+
+        results: Dict[str, np.ndarray] = {}
+        for segment_name, entries in by_segment.items():
+            segment = self._get_segment(segment_name)
+            for vector_id, metadata in entries:
+                vector_bytes = segment.read(metadata["offset"], metadata["size"])
+                if metadata.get("compressed", False):
+                    vector = self.compressor.decompress(vector_bytes)
+                else:
+                    vector = np.frombuffer(vector_bytes, dtype=np.float32)
+                results[vector_id] = vector[:self.dimension]
+        return [results.get(vector_id) for vector_id in ids]
+
     def _append_vector(self, vector: np.ndarray) -> None:
         """Append vector data to active segment."""
         vector_bytes = vector.tobytes()
@@ -69,13 +185,13 @@ class VectorStorage:
             return None
         
         try:
-            segment = SegmentFile(self.storage_path / metadata["segment_id"])
+            segment = self._get_segment(metadata["segment_id"])
             vector_bytes = segment.read(metadata["offset"], metadata["size"])
             
             if metadata.get("compressed", False):
                 vector = self.compressor.decompress(vector_bytes)
             else:
-                vector = np.frombuffer(vector_bytes, dtype=np.float64)
+                vector = np.frombuffer(vector_bytes, dtype=np.float32)
             
             return vector[:self.dimension]  # Ensure correct dimensionality
         except Exception as e:
@@ -86,6 +202,8 @@ class VectorStorage:
         """Compact segments if there are too many."""
         segments = list(self.storage_path.glob("segment_*.db"))
         if len(segments) > threshold:
+            # Cached handles would go stale once the files are rewritten
+            self._drop_cached_segments()
             segment_files = [SegmentFile(path) for path in segments]
             new_segment, offset_map = self.compactor.compact_segments(segment_files)
             
@@ -122,19 +240,28 @@ class VectorCompressor:
         self.subvector_dim = dimension // n_subvectors
         self.n_clusters = n_clusters
         self.codebooks = None
+        self.codebooks_arr = None
+        self.cb_sqnorm = None
+        self._pq = None  # faiss ProductQuantizer when available
         self.is_trained = False
         self.min_vals = None  # For normalization
         self.max_vals = None  # For normalization
-    
+        self._inv_denom = None  # Reciprocal of (max - min), fixed at training
+
     def _normalize_vectors(self, vectors: np.ndarray) -> np.ndarray:
-        """Normalize vectors to improve clustering."""
+        """Normalize vectors to improve clustering.
+
+        The range reciprocal is computed once when the stats are first
+        captured, so the hot encode path is a fused subtract-multiply
+        with no per-call division.
+        """
         if self.min_vals is None:
             self.min_vals = np.min(vectors, axis=0)
             self.max_vals = np.max(vectors, axis=0)
-        
-        denominator = (self.max_vals - self.min_vals)
-        denominator[denominator == 0] = 1  # Avoid division by zero
-        return (vectors - self.min_vals) / denominator
+            denominator = self.max_vals - self.min_vals
+            denominator[denominator == 0] = 1  # Avoid division by zero
+            self._inv_denom = 1.0 / denominator
+        return (vectors - self.min_vals) * self._inv_denom
     
     def _denormalize_vector(self, vector: np.ndarray) -> np.ndarray:
         """Reverse normalization."""
@@ -147,9 +274,20 @@ class VectorCompressor:
             
         vectors = np.array(vectors)
         normalized_vectors = self._normalize_vectors(vectors)
-        
+
+        # Prefer faiss's ProductQuantizer when available: its SIMD
+        # k-means and encode kernels beat the sklearn+NumPy path. faiss
+        # packs codes at log2(n_clusters) bits, so it needs a power of
+        # two cluster count.
+        if _HAS_FAISS and self.n_clusters & (self.n_clusters - 1) == 0:
+            nbits = int(np.log2(self.n_clusters))
+            self._pq = faiss.ProductQuantizer(self.dimension, self.n_subvectors, nbits)
+            self._pq.train(np.ascontiguousarray(normalized_vectors, dtype=np.float32))
+            self.is_trained = True
+            return
+
         from sklearn.cluster import MiniBatchKMeans
-        
+
         self.codebooks = []
         for i in range(self.n_subvectors):
             start_idx = i * self.subvector_dim
@@ -165,35 +303,47 @@ class VectorCompressor:
             )
             kmeans.fit(subvectors)
             self.codebooks.append(kmeans.cluster_centers_)
-        
+
+        # Stacked codebooks and their squared norms let encoding rank
+        # centroids with a single einsum instead of a per-subspace loop
+        self.codebooks_arr = np.stack(self.codebooks)       # (S, K, d')
+        self.cb_sqnorm = (self.codebooks_arr ** 2).sum(-1)  # (S, K)
         self.is_trained = True
-    
-    def compress(self, vector: np.ndarray) -> bytes:
-        """Compress a vector using trained codebooks."""
+
+    def compress_batch(self, vectors: np.ndarray) -> np.ndarray:
+        """Compress a batch of vectors into rows of uint8 PQ codes.
+
+        Normalization and centroid assignment are fused: one reshape to
+        (batch, n_subvectors, subvector_dim), one einsum for all
+        vector-centroid dot products, one argmin. Centroids are ranked
+        by ||c||^2 - 2*x.c, which orders the same as the full squared
+        distance since ||x||^2 is constant per subvector.
+        """
         if not self.is_trained:
             raise RuntimeError("Compressor must be trained before use. Call train() first.")
-        
-        normalized_vector = self._normalize_vectors(vector.reshape(1, -1))[0]
-        codes = []
-        
-        for i in range(self.n_subvectors):
-            start_idx = i * self.subvector_dim
-            end_idx = start_idx + self.subvector_dim
-            subvector = normalized_vector[start_idx:end_idx]
-            
-            # Find nearest centroid using efficient broadcasting
-            distances = np.sum((self.codebooks[i] - subvector) ** 2, axis=1)
-            nearest_idx = np.argmin(distances)
-            codes.append(nearest_idx)
-        
-        return np.array(codes, dtype=np.uint8).tobytes()
+
+        normalized = self._normalize_vectors(np.atleast_2d(vectors))
+        if self._pq is not None:
+            return self._pq.compute_codes(
+                np.ascontiguousarray(normalized, dtype=np.float32))
+        subvectors = normalized.reshape(-1, self.n_subvectors, self.subvector_dim)
+        dots = np.einsum('bsd,skd->bsk', subvectors, self.codebooks_arr)
+        distances = self.cb_sqnorm[None, :, :] - 2.0 * dots
+        return distances.argmin(axis=-1).astype(np.uint8)
+
+    def compress(self, vector: np.ndarray) -> bytes:
+        """Compress a vector using trained codebooks."""
+        return self.compress_batch(vector.reshape(1, -1))[0].tobytes()
     
     def decompress(self, codes: bytes) -> np.ndarray:
         """Decompress vector from codes."""
         if not self.is_trained:
             raise RuntimeError("Compressor must be trained before decompression")
-            
+
         indices = np.frombuffer(codes, dtype=np.uint8)
+        if self._pq is not None:
+            normalized_vector = self._pq.decode(indices.reshape(1, -1))[0].astype(np.float64)
+            return self._denormalize_vector(normalized_vector)
         normalized_vector = np.zeros(self.dimension)
         
         for i in range(self.n_subvectors):
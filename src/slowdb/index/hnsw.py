@@ -1,8 +1,12 @@
 import numpy as np
 from typing import List, Dict, Set, Optional, Tuple, Any
 import heapq
+import math
+import random
 from dataclasses import dataclass
-from .metrics import DistanceMetric
+from .metrics import (DistanceMetric, batch_distance, normalize,
+                      sqeuclidean_distance_vectorized)
+from ._kernels import sq_l2_rows, sq_l2_rows_blocked
 
 @dataclass
 class SearchResult:
@@ -28,7 +32,28 @@ class HNSWGraph:
         self.M_max0 = M * 2  # Max neighbors for layer 0
         self.ef_construction = ef_construction
         self.ml_max = ml_max
-        self.metric = DistanceMetric(metric)
+        # Level multiplier mL = 1/ln(M) from the HNSW paper, so the
+        # expected number of layers stays logarithmic in the node count
+        self._level_mult = 1.0 / math.log(M)
+        # Cosine-family metrics work on unit-length rows, so the metric
+        # collapses to a dot product with no per-call norm work
+        self._normalize = metric in ('cosine', 'angular')
+        self.metric = DistanceMetric(metric, normalized=True) if self._normalize \
+            else DistanceMetric(metric)
+        # Euclidean ranks candidates by squared distance — same order,
+        # no sqrt per candidate; search() takes the root on the final k
+        # results only
+        self._sq_ranking = metric == 'euclidean'
+        self._rank_metric = DistanceMetric('sqeuclidean') if self._sq_ranking \
+            else self.metric
+        # JIT kernel for the layer-search inner loop; None without
+        # numba. Small dimensions take the blocked kernel, which
+        # vectorizes across points so SIMD lanes stay full when d is
+        # below the vector width
+        if metric == 'euclidean':
+            self._sq_rows = sq_l2_rows_blocked if dim < 16 else sq_l2_rows
+        else:
+            self._sq_rows = None
         
         # Core data structures
         self.nodes: Dict[str, np.ndarray] = {}  # id -> vector
@@ -36,10 +61,46 @@ class HNSWGraph:
         self.neighbors: Dict[str, Dict[int, Set[str]]] = {}  # id -> layer -> neighbor ids
         self.entry_point: Optional[str] = None
         self.max_layer = 0
+
+        # Contiguous float32 copy of all vectors, so neighbor distances
+        # can be computed in one batched call instead of per neighbor.
+        # The arena is preallocated and doubled when full, so inserts
+        # are amortized O(1) copies into one cache-friendly block
+        self.node_matrix: Optional[np.ndarray] = None
+        self.node_index: Dict[str, int] = {}  # id -> row in node_matrix
+        self.id_by_index: List[str] = []
+        self._capacity = 0
+        # Row squared norms, cached at insert: the identity-based batch
+        # euclidean then only needs a matvec per query instead of
+        # re-reducing every row
+        self._sqnorms: Optional[np.ndarray] = None
         
+    def _append_row(self, vector: np.ndarray) -> None:
+        """Copy a vector into the next free row of the node matrix,
+        doubling the arena capacity when it is full."""
+        count = len(self.id_by_index)
+        if self.node_matrix is None:
+            self._capacity = 128
+            self.node_matrix = np.empty((self._capacity, self.dim), dtype=np.float32)
+            self._sqnorms = np.empty(self._capacity, dtype=np.float32)
+        elif count == self._capacity:
+            self._capacity *= 2
+            grown = np.empty((self._capacity, self.dim), dtype=np.float32)
+            grown[:count] = self.node_matrix[:count]
+            self.node_matrix = grown
+            grown_norms = np.empty(self._capacity, dtype=np.float32)
+            grown_norms[:count] = self._sqnorms[:count]
+            self._sqnorms = grown_norms
+        self.node_matrix[count] = vector
+        row = self.node_matrix[count]
+        self._sqnorms[count] = row @ row
+
     def _get_random_level(self) -> int:
-        """Generate random level with exponential decay."""
-        return int(-np.log(np.random.random()) * self.M)
+        """Generate random level with exponential decay.
+
+        Uses floor(-ln(U) * mL) with mL = 1/ln(M); stdlib random avoids
+        the per-call overhead of NumPy's scalar RNG on this hot path."""
+        return int(-math.log(random.random()) * self._level_mult)
     
     def _select_neighbors(self, 
                          candidates: List[SearchResult], 
@@ -49,51 +110,78 @@ class HNSWGraph:
         # Simple greedy selection
         return [c.id for c in sorted(candidates)[:M]]
     
-    def _search_layer(self, 
-                     query: np.ndarray, 
+    def _search_layer(self,
+                     query: np.ndarray,
                      entry_point: str,
                      ef: int,
                      layer: int) -> List[SearchResult]:
         """Search for nearest neighbors in a single layer."""
-        visited = {entry_point}
-        candidates = []
-        results = []
-        
-        # Initialize with entry point
-        dist = self.metric(query, self.nodes[entry_point])
-        entry_result = SearchResult(entry_point, dist)
-        heapq.heappush(candidates, entry_result)
-        heapq.heappush(results, entry_result)
-        
+        # Match the matrix dtype so a query equal to a stored vector
+        # compares at distance exactly 0
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        if self._normalize:
+            query = normalize(query)
+
+        # Row-indexed visited bitset: one array load per membership
+        # check instead of hashing id strings
+        visited = np.zeros(len(self.id_by_index), dtype=np.bool_)
+        visited[self.node_index[entry_point]] = True
+
+        # Plain (distance, id) tuples instead of SearchResult objects:
+        # candidates is a min-heap, results a max-heap on negated
+        # distance so the current worst result is O(1) at results[0]
+        entry_dist = float(self._rank_metric(query, self.node_matrix[self.node_index[entry_point]]))
+        candidates = [(entry_dist, entry_point)]
+        results = [(-entry_dist, entry_point)]
+
         while candidates:
-            current = heapq.heappop(candidates)
-            furthest_dist = results[-1].distance if len(results) >= ef else float('inf')
-            
-            if current.distance > furthest_dist:
+            current_dist, current_id = heapq.heappop(candidates)
+            furthest_dist = -results[0][0] if len(results) >= ef else float('inf')
+
+            if current_dist > furthest_dist:
                 break
-            
-            # Check neighbors of current node
-            for neighbor_id in self.neighbors[current.id].get(layer, set()):
-                if neighbor_id not in visited:
-                    visited.add(neighbor_id)
-                    dist = self.metric(query, self.nodes[neighbor_id])
-                    
-                    if len(results) < ef or dist < furthest_dist:
-                        neighbor_result = SearchResult(neighbor_id, dist)
-                        heapq.heappush(candidates, neighbor_result)
-                        heapq.heappush(results, neighbor_result)
-                        
-                        if len(results) > ef:
-                            heapq.heappop(results)
-        
-        return sorted(results)
+
+            # Score all unvisited neighbors of the current node in one
+            # batched call: the JIT gather kernel when available,
+            # otherwise the NumPy batch path
+            unvisited = [(n, r) for n in self.neighbors[current_id].get(layer, set())
+                         if not visited[r := self.node_index[n]]]
+            if not unvisited:
+                continue
+            rows = np.fromiter((r for _, r in unvisited),
+                               dtype=np.int64, count=len(unvisited))
+            visited[rows] = True
+            if self._sq_rows is not None:
+                dists = self._sq_rows(query, self.node_matrix, rows)
+            elif self._sq_ranking:
+                # No JIT kernel: identity-based squared euclidean with
+                # the cached row norms, one matvec and no re-reduction
+                dists = sqeuclidean_distance_vectorized(
+                    query, self.node_matrix[rows], self._sqnorms[rows])
+            else:
+                dists = batch_distance(self._rank_metric, query, self.node_matrix[rows])
+
+            for (neighbor_id, _), dist in zip(unvisited, dists.tolist()):
+                if len(results) < ef or dist < furthest_dist:
+                    heapq.heappush(candidates, (dist, neighbor_id))
+                    heapq.heappush(results, (-dist, neighbor_id))
+
+                    if len(results) > ef:
+                        heapq.heappop(results)
+                        furthest_dist = -results[0][0]
+
+        return [SearchResult(id, dist)
+                for dist, id in sorted((-d, i) for d, i in results)]
     
     def insert(self, id: str, vector: np.ndarray) -> None:
         """Insert a new vector into the index."""
         if id in self.nodes:
             raise ValueError(f"Node {id} already exists in the index")
-        
+
         self.nodes[id] = vector
+        self._append_row(normalize(vector) if self._normalize else vector)
+        self.node_index[id] = len(self.id_by_index)
+        self.id_by_index.append(id)
         
         # Generate random level
         level = min(self._get_random_level(), self.ml_max)
@@ -112,19 +200,23 @@ class HNSWGraph:
             self.max_layer = level
             return
         
-        # Find entry point for insertion
+        # Find entry point for insertion; the greedy descent reads the
+        # float32 matrix rows rather than the per-id vectors
+        query = np.ascontiguousarray(vector, dtype=np.float32)
+        if self._normalize:
+            query = normalize(query)
         curr = self.entry_point
-        curr_dist = self.metric(vector, self.nodes[curr])
-        
+        curr_dist = self._rank_metric(query, self.node_matrix[self.node_index[curr]])
+
         # Search from top to bottom
         for l in range(self.max_layer, -1, -1):
             changed = True
             while changed:
                 changed = False
-                
+
                 # Try to find better candidates
                 for neighbor_id in self.neighbors[curr].get(l, set()):
-                    dist = self.metric(vector, self.nodes[neighbor_id])
+                    dist = self._rank_metric(query, self.node_matrix[self.node_index[neighbor_id]])
                     if dist < curr_dist:
                         curr = neighbor_id
                         curr_dist = dist
@@ -157,7 +249,10 @@ class HNSWGraph:
             results = self._search_layer(query, curr, 1, l)
             curr = results[0].id
         
-        # Search bottom layer with ef = k
+        # Search bottom layer with ef = k; squared-euclidean ranking
+        # pays the sqrt here, on the k returned results only
         results = self._search_layer(query, curr, k, 0)
+        if self._sq_ranking:
+            return [(r.id, math.sqrt(r.distance)) for r in results[:k]]
         return [(r.id, r.distance) for r in results[:k]]
 
@@ -71,6 +71,17 @@ def test_search_nearest(hnsw_index, sample_vectors):
     distances = [d for _, d in results]
     assert distances == sorted(distances)
 
+def test_search_returns_true_distances(hnsw_index, sample_vectors):
+    # Ranking happens in squared-distance space; the distances handed
+    # back by search() must still be plain euclidean
+    for id, vector in sample_vectors[:50]:
+        hnsw_index.insert(id, vector)
+
+    query = np.random.random(10)
+    for id, distance in hnsw_index.search(query, k=5):
+        expected = np.linalg.norm(query - hnsw_index.nodes[id])
+        assert distance == pytest.approx(expected, rel=1e-4)
+
 def test_duplicate_insert(hnsw_index):
     vector = np.random.random(10)
     hnsw_index.insert("test", vector)
@@ -1,6 +1,6 @@
 import pytest
 from pathlib import Path
-from slowdb.core.lsm import LSMTree, SSTable
+from slowdb.core.lsm import BloomFilter, LSMTree, SSTable
 
 @pytest.fixture
 def temp_db_path(tmp_path):
@@ -42,6 +42,84 @@ def test_sstable_creation(lsm_tree):
     sstable_files = list(lsm_tree.base_path.glob("L0-*.sst"))
     assert len(sstable_files) > 0
 
+def test_sstable_reopen(lsm_tree, temp_db_path):
+    # Flush some data to disk
+    for i in range(5):
+        lsm_tree.put(f"key{i}", f"value{i}")
+
+    # A fresh tree should read values back from the SSTable files
+    reopened = LSMTree(memtable_size=3, base_path=temp_db_path)
+    assert reopened.get("key0") == "value0"
+    assert reopened.get("key2") == "value2"
+    assert reopened.get("missing") is None
+
+def test_level_compaction(lsm_tree):
+    # Repeated flushes push L0 over its table budget and trigger merges
+    for i in range(12):
+        lsm_tree.put(f"key{i:02d}", f"value{i}")
+
+    assert all(lsm_tree.get(f"key{i:02d}") == f"value{i}" for i in range(12))
+    # Deeper levels hold at most one merged, non-overlapping table
+    assert len(lsm_tree.levels[1]) <= 1
+
+def test_non_string_map_keys(lsm_tree):
+    # Values holding dicts with non-string keys must survive the
+    # msgpack round trip through flush and SSTable reads
+    lsm_tree.put("m", {1: "a"})
+    for i in range(4):
+        lsm_tree.put(f"key{i}", f"value{i}")
+
+    assert lsm_tree.get("m") == {1: "a"}
+    sstable = lsm_tree.levels[0][0]
+    assert dict(sstable)["m"] == {1: "a"}
+
+def test_sstable_iteration(lsm_tree):
+    for i in range(5):
+        lsm_tree.put(f"key{i}", f"value{i}")
+
+    sstable = lsm_tree.levels[0][0]
+    entries = list(sstable)
+    assert entries == sorted(entries)
+    assert len(entries) == sstable.entry_count
+
+def test_wal_replay(lsm_tree, temp_db_path):
+    # Stay below the flush threshold so data only lives in the WAL
+    lsm_tree.put("key1", "value1")
+    lsm_tree.put("key2", "value2")
+
+    # A fresh tree must recover the unflushed entries from the WAL
+    recovered = LSMTree(memtable_size=3, base_path=temp_db_path)
+    assert recovered.get("key1") == "value1"
+    assert recovered.get("key2") == "value2"
+
+def test_wal_replay_non_string_map_keys(lsm_tree, temp_db_path):
+    # An unflushed value with non-string dict keys must not brick the
+    # store: reopening replays it from the WAL
+    lsm_tree.put("m", {1: "a"})
+
+    recovered = LSMTree(memtable_size=3, base_path=temp_db_path)
+    assert recovered.get("m") == {1: "a"}
+
+def test_bloom_filter_no_false_negatives():
+    bloom = BloomFilter(100)
+    for i in range(100):
+        bloom.add(f"key{i}")
+
+    # Every inserted key must be reported as possibly present
+    assert all(bloom.might_contain(f"key{i}") for i in range(100))
+    # Most absent keys should be ruled out
+    misses = sum(not bloom.might_contain(f"other{i}") for i in range(100))
+    assert misses > 90
+
+def test_bloom_filter_persisted(lsm_tree, temp_db_path):
+    for i in range(5):
+        lsm_tree.put(f"key{i}", f"value{i}")
+
+    reopened = LSMTree(memtable_size=3, base_path=temp_db_path)
+    sstable = reopened.levels[0][0]
+    assert sstable.bloom is not None
+    assert sstable.bloom.might_contain("key0")
+
 @pytest.mark.skip(reason="LSM tree compaction tests temporarily disabled")
 def test_compaction_trigger(lsm_tree):
     # Add enough data to trigger compaction
@@ -1,13 +1,19 @@
 import pytest
 import numpy as np
+from slowdb.index import metrics
 from slowdb.index.metrics import (
-    DistanceMetric, 
-    euclidean_distance, 
-    cosine_distance, 
-    manhattan_distance, 
+    DistanceMetric,
+    euclidean_distance,
+    cosine_distance,
+    manhattan_distance,
     dot_product_distance,
     angular_distance,
-    batch_distance
+    batch_distance,
+    binarize,
+    hamming_distance_binary,
+    quantize_int8,
+    int8_euclidean_distance,
+    int8_cosine_distance
 )
 
 @pytest.fixture
@@ -34,11 +40,62 @@ def test_manhattan_distance():
     v2 = np.array([0, 1, 1])
     assert manhattan_distance(v1, v2) == 3
 
+def test_sqeuclidean_distance():
+    np.random.seed(13)
+    v1 = np.random.random(10)
+    v2 = np.random.random(10)
+    expected = euclidean_distance(v1, v2) ** 2
+    assert metrics.sqeuclidean_distance(v1, v2) == pytest.approx(expected)
+    assert DistanceMetric('sqeuclidean')(v1, v2) == pytest.approx(expected, rel=1e-5)
+    assert metrics.sqeuclidean_distance_vectorized(v1, np.stack([v2]))[0] == \
+        pytest.approx(expected, rel=1e-5)
+
 def test_dot_product_distance():
     v1 = np.array([1, 2, 3])
     v2 = np.array([4, 5, 6])
     assert dot_product_distance(v1, v2) == -(1*4 + 2*5 + 3*6)
 
+def test_hamming_distance(monkeypatch):
+    np.random.seed(7)
+    v1 = np.random.randn(64)
+    v2 = np.random.randn(64)
+    expected = int(((v1 > 0) != (v2 > 0)).sum())
+
+    b1, b2 = binarize(v1), binarize(v2)
+    assert hamming_distance_binary(b1, b1) == 0
+    assert hamming_distance_binary(b1, b2) == expected
+    assert DistanceMetric('hamming')(b1, b2) == expected
+
+    # The byte-table fallback for NumPy without bitwise_count must agree
+    monkeypatch.setattr(metrics, '_HAS_BITWISE_COUNT', False)
+    assert hamming_distance_binary(b1, b2) == expected
+
+def test_int8_metrics(monkeypatch):
+    np.random.seed(11)
+    v1 = np.random.random(64)
+    v2 = np.random.random(64)
+    scale = 1.0 / 127
+    q1, q2 = quantize_int8(v1, scale), quantize_int8(v2, scale)
+
+    # Quantized distances must track the float reference, on the simsimd
+    # branch when installed and always on the widened-int32 NumPy branch
+    results = []
+    branches = ([True] if metrics._HAS_SIMSIMD else []) + [False]
+    for has_simd in branches:
+        monkeypatch.setattr(metrics, '_HAS_SIMSIMD', has_simd)
+        l2 = int8_euclidean_distance(q1, q2, scale)
+        cos = int8_cosine_distance(q1, q2)
+        assert l2 == pytest.approx(euclidean_distance(v1, v2), abs=0.05)
+        assert cos == pytest.approx(cosine_distance(v1, v2), abs=0.02)
+        results.append((l2, cos))
+    # Both branches must agree with each other, not just the reference
+    for l2, cos in results[1:]:
+        assert l2 == pytest.approx(results[0][0], rel=1e-6)
+        assert cos == pytest.approx(results[0][1], rel=1e-6)
+
+    metric = DistanceMetric('euclidean_i8', scale=scale)
+    assert metric(q1, q2) == pytest.approx(euclidean_distance(v1, v2), abs=0.05)
+
 def test_batch_distance(vectors, query_vector):
     metric = DistanceMetric('euclidean')
     distances = batch_distance(metric, query_vector, vectors)
@@ -59,6 +59,16 @@ def test_invalid_dimension(vector_storage):
     with pytest.raises(ValueError, match="Vector dimension mismatch"):
         vector_storage.store_vector("invalid", invalid_vector)
 
+def test_batch_store_and_retrieval(vector_storage):
+    ids = [f"batch_{i}" for i in range(8)]
+    vectors = np.random.random((8, 10))
+    vector_storage.store_vectors(ids, vectors)
+
+    retrieved = vector_storage.get_vectors(ids + ["missing"])
+    assert retrieved[-1] is None
+    for vector, got in zip(vectors, retrieved):
+        assert np.allclose(vector, got, rtol=1e-6)
+
 def test_segment_compaction(vector_storage, sample_vectors):
     # Train compressor first
     vector_storage.train_compression(sample_vectors)